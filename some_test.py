@@ -92,8 +92,68 @@ def vector_similarity_speed_test(test_name, max_time):
     return True
 
 
+def vector_recall_calibration_test(test_name, max_time):
+
+    num_of_arrays = 1000
+    array_dims = 100
+    arrays_to_insert = np.random.randn(num_of_arrays, array_dims)
+
+    TARGET_RECALL = 0.9
+    TOP_N = 10
+
+    vs = VectorSpace("teo", array_dims, 0.02)
+    for array in arrays_to_insert:
+        vs.insert_vector(array)
+
+    with timer(max_time) as t:
+        vs.calibrate(target_recall=TARGET_RECALL, top_n=TOP_N, sample_size=50)
+
+    print(f"""
+    ---
+    Calibration time: {t.elapsed:.3f} seconds
+    Number of partitions {len(vs.spaces)}
+    Measured recall per partition {[s.measured_recall for s in vs.spaces]}
+    ---
+    """)
+
+    # every calibrated partition reaches the target on the calibration sample
+    for s in vs.spaces:
+        if s.calibrated_size > 0:
+            assert s.measured_recall >= TARGET_RECALL, f"partition recall {s.measured_recall} < {TARGET_RECALL}"
+
+    # end to end recall against a brute force search (pks are assigned from 1 in insertion order),
+    # with some tolerance since the calibration only sees a sample of queries
+    hits = 0
+    queries = np.random.randn(30, array_dims)
+    for query in queries:
+        truth = set(np.argsort(np.linalg.norm(arrays_to_insert - query, axis=1))[:TOP_N] + 1)
+        hits += len(truth.intersection(vs.get_similar_vectors(query, TOP_N, False).astype(int)))
+    end_to_end_recall = hits / (len(queries) * TOP_N)
+    print(f"End to end recall: {end_to_end_recall:.3f}")
+    assert end_to_end_recall >= TARGET_RECALL - 0.05, f"end to end recall {end_to_end_recall} < {TARGET_RECALL}"
+
+    vs.destroy()
+
+    # a partition that grows by retune_growth gets calibrated again
+    vs = VectorSpace("teo", array_dims, 1000)
+    for array in arrays_to_insert[:100]:
+        vs.insert_vector(array)
+    vs.calibrate(target_recall=TARGET_RECALL, top_n=TOP_N, sample_size=50, retune_growth=2.0)
+    space = vs.spaces[0]
+    first_calibrated_size = space.calibrated_size
+    for array in arrays_to_insert[100:200]:
+        vs.insert_vector(array)
+    assert space.calibrated_size != first_calibrated_size, "partition not retuned after growing"
+    assert space.calibrated_size >= first_calibrated_size * 2
+
+    vs.destroy()
+    return True
+
+
 vector_similarity_speed_test(vector_insertion_speed_test.__name__, 10)
 
+vector_recall_calibration_test(vector_recall_calibration_test.__name__, 10)
+
 # vector_insertion_speed_test(vector_insertion_speed_test.__name__, 10)
 
 
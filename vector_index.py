@@ -68,35 +68,40 @@ class VectorIndex:
         np_data = np.array(data)
         return self.update_index(np_data[:, 0].astype(np.int), np_data[:,1:])
 
+    def get_tree_count(self) -> int:
+        """Return the number of trees in the built index."""
+        return self.vector_index.get_n_trees()
+
     def get_nearest_vectors_indices(self,
-        ref:Union[int,List[float]], top_n:int, include_distances:bool=False
+        ref:Union[int,List[float]], top_n:int, include_distances:bool=False, search_k:int=-1
         ) -> Union[ List[int], Tuple[List[int], List[float]] ]:
         """
         Return a list of the closes vectors rappresented as their indices during insertion.
         The reference vector, can be provided both as its index in the space or as a list of floats (if the vector has not been inserted).
         It is possible to return the distances too.
+        'search_k' is the number of nodes Annoy inspects (-1 means Annoy default, top_n * number of trees).
 
         I splitted the function in two because I found that the Annoy library typing requires a 'Literal[True]/Literal[False]
         """
         if include_distances:
-            return self._get_nearest_vectors_indices_with_distancies(ref, top_n)
+            return self._get_nearest_vectors_indices_with_distancies(ref, top_n, search_k)
         else:
-            return self._get_nearest_vectors_indices_without_distancies(ref, top_n)
+            return self._get_nearest_vectors_indices_without_distancies(ref, top_n, search_k)
 
 
-    def _get_nearest_vectors_indices_with_distancies(self, ref:Union[int,List[float]], top_n:int) -> Tuple[List[int], List[float]]:
+    def _get_nearest_vectors_indices_with_distancies(self, ref:Union[int,List[float]], top_n:int, search_k:int=-1) -> Tuple[List[int], List[float]]:
         if isinstance(ref, list) or isinstance(ref, np.ndarray):
-            return  self.vector_index.get_nns_by_vector(ref, top_n, include_distances = True)
+            return  self.vector_index.get_nns_by_vector(ref, top_n, search_k = search_k, include_distances = True)
         elif isinstance(ref, int):
-            return self.vector_index.get_nns_by_item(ref, top_n, include_distances = True)
+            return self.vector_index.get_nns_by_item(ref, top_n, search_k = search_k, include_distances = True)
         else:
             raise Exception(f"Please, provide an index or a vector, got {type(ref)}.")
 
-    def _get_nearest_vectors_indices_without_distancies(self, ref:Union[int,List[float]], top_n:int) -> List[int]:
+    def _get_nearest_vectors_indices_without_distancies(self, ref:Union[int,List[float]], top_n:int, search_k:int=-1) -> List[int]:
         if isinstance(ref, list) or isinstance(ref, np.ndarray):
-            return  self.vector_index.get_nns_by_vector(ref, top_n, include_distances = False)
+            return  self.vector_index.get_nns_by_vector(ref, top_n, search_k = search_k, include_distances = False)
         elif isinstance(ref, int):
-            return self.vector_index.get_nns_by_item(ref, top_n, include_distances = False)
+            return self.vector_index.get_nns_by_item(ref, top_n, search_k = search_k, include_distances = False)
         else:
             raise Exception(f"Please, provide an index or a vector, got {type(ref)}.")
     
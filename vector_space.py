@@ -1,6 +1,8 @@
 
-from typing import Any, List, Optional
+from typing import Any, List, Optional, Sequence
 from pathlib import Path
+from os      import sep    as os_separator
+from math    import ceil
 
 from time import monotonic as timing
 import numpy as np
@@ -30,6 +32,17 @@ class VectorSpace:
         self.rebalance_probs = rebalance_probs
         self.create_partition()
 
+        # recall calibration (see calibrate)
+        self.target_recall:Optional[float] = None
+        self.calibration_top_n:int = 10
+        self.calibration_sample_size:int = 100
+        self.retune_growth:float = 2.0
+        self.tree_count_exponentials:Sequence[float] = (0.2, 0.3, 0.4, 0.5)
+        self.candidates_factors:Sequence[float] = (1, 2, 4)
+        self.search_k_factors:Sequence[float] = (1, 2, 4, 8, 16)
+        self.build_cost_weight:float = 0.0
+        self.calibration_table = f"{name.split(os_separator)[-1]}_calibration"
+
     def create_partition(self, max_unsynched_vectors:int=0) -> None:
         """Creates a partition with a default name """
         self.spaces.append(
@@ -52,13 +65,24 @@ class VectorSpace:
                 return space.vector_space_partition.get_vector(pk)
         raise ValueError(f"Vector with pk {pk} not found")
 
+    def _search_parameters(self, space:VectorSpacePartitionStats, top_n:int):
+        """
+        Return how many candidates to ask to a partition and the search_k to use.
+        Calibrated partitions use their own parameters, the others fall back to a size based guess (never less than top_n).
+        """
+        if space.candidates_factor is None:
+            return max(top_n, space.vector_space_size()//15 + 1), -1
+        candidates = ceil(space.candidates_factor * top_n)
+        return candidates, space.vector_space_partition.search_k_for(candidates, space.search_k_factor)
+
     def get_similar_vectors(self, ref:List[float], top_n:int, include_distances:bool=False):
         """return closest vectors to the given one"""
         similars = []
         _partition_indices, _partition_distances = None, None
         for space in self.spaces:
+            candidates, search_k = self._search_parameters(space, top_n)
             _partition_indices, _partition_distances = space.vector_space_partition.get_similar_vectors(
-                ref, space.vector_space_size()//15 + 1, True
+                ref, candidates, True, search_k
             )
             assert isinstance(_partition_indices, list) and isinstance(_partition_distances, list)
             similars += [
@@ -100,6 +124,116 @@ class VectorSpace:
         if timing()-start > self.max_insert_time:
             self.create_partition()
 
+        # partitions that grew too much since last calibration get re-tuned,
+        # new partitions get calibrated as soon as they hold more than calibration_top_n vectors
+        target_space = self.spaces[random_partition_index]
+        if self.target_recall is not None and target_space.vector_space_size() >= max(
+            self.calibration_top_n + 1, target_space.calibrated_size * self.retune_growth
+        ):
+            self.calibrate_partition(target_space)
+
+    def calibrate(self,
+        target_recall:float, top_n:int=10, sample_size:int=100, retune_growth:float=2.0,
+        tree_count_exponentials:Optional[Sequence[float]]=None,
+        candidates_factors:Optional[Sequence[float]]=None,
+        search_k_factors:Optional[Sequence[float]]=None,
+        build_cost_weight:float=0.0
+        ) -> None:
+        """
+        Tunes every partition to reach 'target_recall' (recall@top_n) inspecting as few nodes (search_k) as possible.
+        parameters:
+            target_recall: fraction of the exact top_n neighbours that should be returned (eg. 0.9)
+            top_n: the number of neighbours the recall is measured on
+            sample_size: number of stored vectors used as queries, the query itself is excluded from results
+            retune_growth: a partition is calibrated again when its size gets multiplied by this factor
+            tree_count_exponentials, candidates_factors, search_k_factors: the values to try (see VectorSpacePartition.calibrate)
+            build_cost_weight: how much index rebuild time (trees * partition size) weights against search_k (0 means ignored)
+        The chosen parameters are saved on the database and kept up to date while vectors are inserted.
+        """
+        if not 0 < target_recall <= 1:
+            raise Exception(f"Target recall must be in (0, 1], got {target_recall}.")
+        if top_n < 1 or sample_size < 1:
+            raise Exception(f"Please, provide a positive top_n and sample_size, got {top_n} and {sample_size}.")
+        if retune_growth <= 1:
+            raise Exception(f"Retune growth must be greater than 1, got {retune_growth}.")
+        if build_cost_weight < 0:
+            raise Exception(f"Build cost weight can not be negative, got {build_cost_weight}.")
+        for values_name, values, minimum in (
+            ("tree_count_exponentials", tree_count_exponentials, 0),
+            ("candidates_factors", candidates_factors, 1),
+            ("search_k_factors", search_k_factors, 1),
+        ):
+            if values is not None and (len(values) == 0 or min(values) < minimum):
+                raise Exception(f"{values_name} must be a non empty list of values >= {minimum}, got {values}.")
+
+        self.target_recall = target_recall
+        self.calibration_top_n = top_n
+        self.calibration_sample_size = sample_size
+        self.retune_growth = retune_growth
+        self.build_cost_weight = build_cost_weight
+        if tree_count_exponentials is not None:
+            self.tree_count_exponentials = tree_count_exponentials
+        if candidates_factors is not None:
+            self.candidates_factors = candidates_factors
+        if search_k_factors is not None:
+            self.search_k_factors = search_k_factors
+
+        self.db_connection.write_on_db(f"""CREATE TABLE IF NOT EXISTS {self.calibration_table} (
+            partition_name TEXT PRIMARY KEY,
+            partition_size INTEGER NOT NULL,
+            top_n INTEGER NOT NULL,
+            target_recall REAL NOT NULL,
+            measured_recall REAL NOT NULL,
+            tree_count_exponential REAL NOT NULL,
+            candidates_factor REAL NOT NULL,
+            search_k_factor REAL NOT NULL,
+            search_k INTEGER NOT NULL,
+            slower_than_exact INTEGER NOT NULL
+        );""")
+
+        queries = self._sample_queries(sample_size)
+        for space in self.spaces:
+            self.calibrate_partition(space, queries)
+
+    def _sample_queries(self, sample_size:int) -> List[List[float]]:
+        """Return some stored vectors (as pk+vector), picked randomly from every partition"""
+        stored = [s.vector_space_partition.get_space() for s in self.spaces if s.vector_space_size() > 0]
+        if len(stored) == 0:
+            return []
+        stored = np.concatenate(stored)
+        picked = np.random.choice(len(stored), min(sample_size, len(stored)), replace=False)
+        return stored[picked]
+
+    def calibrate_partition(self, space:VectorSpacePartitionStats, queries:Optional[List[List[float]]]=None) -> None:
+        """
+        Calibrates a single partition with the settings given to calibrate, and saves the result.
+        Partitions with less than two vectors are skipped (there is nothing to measure).
+        """
+        if self.target_recall is None:
+            raise Exception("Please, call calibrate before calibrating a single partition.")
+        if space.vector_space_size() < 2:
+            return
+        if queries is None:
+            queries = self._sample_queries(self.calibration_sample_size)
+
+        partition = space.vector_space_partition
+        tree_count_exponential, candidates_factor, search_k_factor, measured_recall, search_k = partition.calibrate(
+            queries, self.calibration_top_n, self.target_recall,
+            self.tree_count_exponentials, self.candidates_factors, self.search_k_factors, self.build_cost_weight
+        )
+        space.candidates_factor = candidates_factor
+        space.search_k_factor = search_k_factor
+        space.calibrated_size = space.vector_space_size()
+        space.measured_recall = measured_recall
+        space.calibrated_search_k = search_k
+        space.slower_than_exact = search_k >= space.calibrated_size
+
+        self.db_connection.write_on_db(f"""INSERT OR REPLACE INTO {self.calibration_table} VALUES (
+            '{partition.th.table_name}', {space.calibrated_size}, {self.calibration_top_n}, {self.target_recall},
+            {measured_recall}, {tree_count_exponential}, {candidates_factor}, {search_k_factor},
+            {search_k}, {int(space.slower_than_exact)}
+        );""")
+
     def destroy(self) -> None:
         """
         Destroys every partition from the space
@@ -1,6 +1,8 @@
 
-from typing import Any, List, Optional, Union
+from typing import Any, List, Optional, Sequence, Set, Tuple, Union
 from pathlib import Path
+from math    import ceil
+import numpy as np
 from os      import sep    as os_separator
 
 from table_handler import TableHandler
@@ -76,14 +78,122 @@ class VectorSpacePartition:
         """Returns a specific vector"""
         return self.th.get_row(pk)
 
-    def get_similar_vectors(self, ref:Union[int, List[float]], top_n:int, include_distances:bool=False):
+    def get_similar_vectors(self, ref:Union[int, List[float]], top_n:int, include_distances:bool=False, search_k:int=-1):
         """
         Return vectors similar to 'ref'.
         Tipically very fast (1ms).
 
         This function can be usefull to get the pk of a vector (which may have been inserted without storing the index)
         """
-        return self.vi.get_nearest_vectors_indices(ref, top_n, include_distances = include_distances)
+        return self.vi.get_nearest_vectors_indices(ref, top_n, include_distances = include_distances, search_k = search_k)
+
+    def _get_exact_similar_vectors(self, ref:List[float], top_n:int, space:List[List[float]]) -> List[int]:
+        """
+        Brute force search of the pks closest to 'ref' in 'space' (pk+vectors, as returned by get_space).
+        It does not use the index: it is slow but exact, so it is used as ground truth for calibration.
+        Distances are computed as Annoy does for the index metric.
+        """
+        np_space = np.array(space)
+        pks, vectors = np_space[:, 0].astype(int), np_space[:, 1:]
+        np_ref = np.array(ref, dtype=float)
+
+        metric = self.vi.vector_distance_metric
+        if metric == "euclidean":
+            distances = np.linalg.norm(vectors - np_ref, axis=1)
+        elif metric == "angular":
+            norms = np.maximum(np.linalg.norm(vectors, axis=1) * np.linalg.norm(np_ref), 1e-12)
+            distances = np.sqrt(np.maximum(2 - 2 * (vectors @ np_ref) / norms, 0))
+        elif metric == "dot":
+            distances = -(vectors @ np_ref)
+        elif metric == "hamming":
+            distances = np.count_nonzero(vectors != np_ref, axis=1)
+        else:
+            raise Exception(f"Unknown metric {metric}.")
+
+        return pks[np.argsort(distances, kind="stable")[:top_n]].tolist()
+
+    def search_k_for(self, candidates:int, search_k_factor:float) -> int:
+        """
+        Converts a search_k factor in the search_k to give to Annoy when asking for 'candidates' vectors.
+        A factor of 1 (or less) is Annoy default (candidates * number of trees), so -1 is returned.
+        """
+        if search_k_factor <= 1:
+            return -1
+        return int(search_k_factor * candidates * self.vi.get_tree_count())
+
+    def _measure_recall(self, ground_truths:List[Tuple[int, List[float], Set[int]]], candidates:int, search_k:int) -> float:
+        """
+        Return the fraction of exact neighbours found among the 'candidates' returned by the index.
+        The query vector itself (which is stored in the space) is never counted.
+        """
+        hits, expected = 0, 0
+        for query_pk, query_vector, truth in ground_truths:
+            found = [
+                i for i in self.get_similar_vectors(query_vector, candidates + 1, False, search_k)
+                if i != query_pk
+            ][:candidates]
+            hits += len(truth.intersection(found))
+            expected += len(truth)
+        return hits / expected if expected > 0 else 1.0
+
+    def calibrate(self,
+        queries:List[List[float]], top_n:int, target_recall:float,
+        tree_count_exponentials:Sequence[float], candidates_factors:Sequence[float], search_k_factors:Sequence[float],
+        build_cost_weight:float=0.0
+        ) -> Tuple[float, float, float, float, int]:
+        """
+        Search the index parameters with the lowest search cost that reach 'target_recall' (recall@top_n) on the given queries.
+        Queries are pk+vectors (same as get_space), the exact neighbours in this partition are used as ground truth.
+
+        The search cost of a configuration is the number of nodes Annoy inspects (search_k = search_k_factor * candidates * number of trees),
+        compared across every tree count. Since the index is rebuilt on insertion, 'build_cost_weight' adds
+        build_cost_weight * number of trees * partition size to the cost (0 means only search speed matters).
+        Configurations with search_k >= partition size are slower than an exact scan: they are chosen only if nothing else reaches the target.
+        If the target is never reached, the most accurate configuration is kept.
+        Returns (tree_count_exponential, candidates_factor, search_k_factor, measured_recall, search_k).
+        """
+        space = self.get_space()
+        partition_size = len(space)
+        ground_truths = []
+        for query in queries:
+            query_pk, query_vector = int(query[0]), query[1:]
+            truth = [
+                i for i in self._get_exact_similar_vectors(query_vector, top_n + 1, space)
+                if i != query_pk
+            ][:top_n]
+            if len(truth) > 0:
+                ground_truths.append((query_pk, query_vector, set(truth)))
+
+        best, best_rank, most_accurate, most_accurate_rank = None, None, None, None
+        for tree_count_exponential in sorted(tree_count_exponentials):
+            self.vi.tree_count_exponential = tree_count_exponential
+            self._maybe_sync(0, force_update=True)
+            tree_count = self.vi.get_tree_count()
+
+            for candidates_factor in sorted(candidates_factors):
+                candidates = ceil(candidates_factor * top_n)
+                for search_k_factor in sorted(search_k_factors):
+                    recall = self._measure_recall(
+                        ground_truths, candidates, self.search_k_for(candidates, search_k_factor)
+                    )
+                    search_k = int(max(1, search_k_factor) * candidates * tree_count)
+                    cost = search_k + build_cost_weight * tree_count * partition_size
+                    configuration = (tree_count_exponential, candidates_factor, search_k_factor, recall, search_k)
+
+                    if most_accurate is None or (-recall, cost) < most_accurate_rank:
+                        most_accurate, most_accurate_rank = configuration, (-recall, cost)
+                    if recall >= target_recall:
+                        rank = (search_k >= partition_size, cost)
+                        if best is None or rank < best_rank:
+                            best, best_rank = configuration, rank
+                        # bigger search_k would only cost more
+                        break
+
+        chosen = best if best is not None else most_accurate
+        if self.vi.tree_count_exponential != chosen[0]:
+            self.vi.tree_count_exponential = chosen[0]
+            self._maybe_sync(0, force_update=True)
+        return chosen
 
 
     def _delete_vector_space(self):
@@ -103,6 +213,14 @@ class VectorSpacePartitionStats:
         self.vector_space_partition = vsp 
         #self.vector_space_size = 0
         self.pks_in_vector_space_partition = set()
+        # search parameters set by VectorSpace calibration (None means not calibrated)
+        self.candidates_factor:Optional[float] = None
+        self.search_k_factor:float = 1
+        self.calibrated_size:int = 0
+        self.measured_recall:Optional[float] = None
+        self.calibrated_search_k:int = 0
+        # True when calibration could not do better than inspecting as many nodes as the partition holds
+        self.slower_than_exact:bool = False
 
     def vector_space_size(self):
         return len(self.pks_in_vector_space_partition)